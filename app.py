@@ -1,14 +1,27 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, Response
 from pydantic import BaseModel
-from typing import Literal, List
+from typing import Literal, List, Dict, Tuple, BinaryIO, Iterator, Optional
 import re
 import csv
-import io
+import codecs
+import functools
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+import ahocorasick
+import orjson
 
 app = FastAPI(title="Support Ticket Triage", version="1.0.0")
 
+# Bulk results repeat the same few categories and rationales, so they compress well
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+# Shared worker pool for bulk triage, which would otherwise block the event loop
+EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count())
+
 class TriageRequest(BaseModel):
     text: str
 
@@ -18,39 +31,117 @@ class TriageResponse(BaseModel):
     rationale: str
     text: str = ""  # Original ticket text
 
+class BulkTriageTicket(BaseModel):
+    index: int  # Position of the ticket among the texts extracted from the CSV
+    category: Literal["billing", "bug", "feature", "other"]
+    urgency: Literal["low", "medium", "high"]
+    rationale: str
+    text: Optional[str] = None  # Original ticket text, only with include_text
+
 class BulkTriageResponse(BaseModel):
-    tickets: List[TriageResponse]
+    tickets: List[BulkTriageTicket]
     total_processed: int
 
-def categorize_ticket(text: str) -> str:
-    """Determine ticket category based on keywords"""
-    text_lower = text.lower()
-    
-    # Billing keywords
-    billing_keywords = [
-        "charged", "charge", "billed", "bill", "payment", "pay", "money", 
-        "refund", "credit", "debit", "subscription", "plan", "price", "cost",
-        "invoice", "receipt", "transaction", "duplicate", "overcharge"
-    ]
-    
-    # Bug keywords
-    bug_keywords = [
-        "error", "broken", "crash", "fail", "not working", "doesn't work",
-        "issue", "problem", "bug", "glitch", "freeze", "hang", "slow",
-        "crashed", "failed", "broken", "malfunction", "defect"
-    ]
-    
-    # Feature keywords
-    feature_keywords = [
-        "add", "new feature", "enhancement", "improvement", "suggestion",
-        "request", "would like", "could you", "missing", "need", "want",
-        "idea", "proposal", "recommendation", "wish", "hope"
-    ]
-    
-    # Count keyword matches
-    billing_count = sum(1 for word in billing_keywords if word in text_lower)
-    bug_count = sum(1 for word in bug_keywords if word in text_lower)
-    feature_count = sum(1 for word in feature_keywords if word in text_lower)
+# Category keywords
+BILLING_KEYWORDS = [
+    "charged", "charge", "billed", "bill", "payment", "pay", "money", 
+    "refund", "credit", "debit", "subscription", "plan", "price", "cost",
+    "invoice", "receipt", "transaction", "duplicate", "overcharge"
+]
+
+BUG_KEYWORDS = [
+    "error", "broken", "crash", "fail", "not working", "doesn't work",
+    "issue", "problem", "bug", "glitch", "freeze", "hang", "slow",
+    "crashed", "failed", "malfunction", "defect"
+]
+
+FEATURE_KEYWORDS = [
+    "add", "new feature", "enhancement", "improvement", "suggestion",
+    "request", "would like", "could you", "missing", "need", "want",
+    "idea", "proposal", "recommendation", "wish", "hope"
+]
+
+# High urgency indicators
+HIGH_URGENCY_KEYWORDS = [
+    "urgent", "asap", "immediately", "critical", "emergency", "broken",
+    "not working", "can't access", "locked out", "security", "hacked",
+    "data loss", "down", "outage", "duplicate charge", "overcharged"
+]
+
+# Medium urgency indicators
+MEDIUM_URGENCY_KEYWORDS = [
+    "soon", "today", "this week", "important", "blocking", "stuck",
+    "can't proceed", "issue", "problem", "bug", "glitch"
+]
+
+# Category-specific urgency triggers
+BILLING_HIGH_URGENCY_KEYWORDS = ["duplicate", "overcharge", "wrong amount", "double"]
+BILLING_MEDIUM_URGENCY_KEYWORDS = ["refund", "credit", "dispute"]
+BUG_HIGH_URGENCY_KEYWORDS = ["crash", "broken", "not working", "can't access"]
+BUG_LOW_URGENCY_KEYWORDS = ["slow", "glitch", "minor"]
+
+# Keywords that switch the category rationale to the "detected" wording
+BILLING_RATIONALE_KEYWORDS = ["duplicate", "overcharge"]
+BUG_RATIONALE_KEYWORDS = ["crash", "broken"]
+
+# Every distinct keyword across all lists gets its own bit in the hit mask. A keyword
+# shared by several lists ("broken", "not working", "duplicate") is matched once and
+# its bit counts toward each list's mask below.
+KEYWORD_BITS = {
+    keyword: 1 << index
+    for index, keyword in enumerate(dict.fromkeys(
+        BILLING_KEYWORDS + BUG_KEYWORDS + FEATURE_KEYWORDS
+        + HIGH_URGENCY_KEYWORDS + MEDIUM_URGENCY_KEYWORDS
+        + BILLING_HIGH_URGENCY_KEYWORDS + BILLING_MEDIUM_URGENCY_KEYWORDS
+        + BUG_HIGH_URGENCY_KEYWORDS + BUG_LOW_URGENCY_KEYWORDS
+    ))
+}
+
+def keyword_mask(keywords: List[str]) -> int:
+    """Combine the bits of a keyword list into a single mask"""
+    mask = 0
+    for keyword in keywords:
+        mask |= KEYWORD_BITS[keyword]
+    return mask
+
+BILLING_MASK = keyword_mask(BILLING_KEYWORDS)
+BUG_MASK = keyword_mask(BUG_KEYWORDS)
+FEATURE_MASK = keyword_mask(FEATURE_KEYWORDS)
+HIGH_URGENCY_MASK = keyword_mask(HIGH_URGENCY_KEYWORDS)
+MEDIUM_URGENCY_MASK = keyword_mask(MEDIUM_URGENCY_KEYWORDS)
+BILLING_HIGH_URGENCY_MASK = keyword_mask(BILLING_HIGH_URGENCY_KEYWORDS)
+BILLING_MEDIUM_URGENCY_MASK = keyword_mask(BILLING_MEDIUM_URGENCY_KEYWORDS)
+BUG_HIGH_URGENCY_MASK = keyword_mask(BUG_HIGH_URGENCY_KEYWORDS)
+BUG_LOW_URGENCY_MASK = keyword_mask(BUG_LOW_URGENCY_KEYWORDS)
+BILLING_RATIONALE_MASK = keyword_mask(BILLING_RATIONALE_KEYWORDS)
+BUG_RATIONALE_MASK = keyword_mask(BUG_RATIONALE_KEYWORDS)
+
+def build_keyword_automaton(keyword_bits: Dict[str, int]) -> ahocorasick.Automaton:
+    """Build an Aho-Corasick automaton that yields each keyword's (bit, length) on match"""
+    automaton = ahocorasick.Automaton()
+    for keyword, bit in keyword_bits.items():
+        automaton.add_word(keyword, (bit, len(keyword)))
+    automaton.make_automaton()
+    return automaton
+
+# Built once at import and shared by every request
+KEYWORD_AUTOMATON = build_keyword_automaton(KEYWORD_BITS)
+
+def scan_keywords(text_lower: str) -> int:
+    """Return the mask of keywords present in the text, in a single pass"""
+    mask = 0
+    for end, (bit, length) in KEYWORD_AUTOMATON.iter(text_lower):
+        start = end - length + 1
+        # Keywords must begin a word, so "charge" does not fire inside "discharge"
+        if start == 0 or not text_lower[start - 1].isalnum():
+            mask |= bit
+    return mask
+
+def _categorize(mask: int) -> str:
+    """Determine ticket category from the keyword hit mask"""
+    billing_count = bin(mask & BILLING_MASK).count("1")
+    bug_count = bin(mask & BUG_MASK).count("1")
+    feature_count = bin(mask & FEATURE_MASK).count("1")
     
     # Return category with highest keyword count, default to "other"
     if billing_count > bug_count and billing_count > feature_count:
@@ -62,64 +153,39 @@ def categorize_ticket(text: str) -> str:
     else:
         return "other"
 
-def determine_urgency(text: str, category: str) -> str:
-    """Determine urgency level based on category and keywords"""
-    text_lower = text.lower()
-    
-    # High urgency indicators
-    high_urgency_keywords = [
-        "urgent", "asap", "immediately", "critical", "emergency", "broken",
-        "not working", "can't access", "locked out", "security", "hacked",
-        "data loss", "down", "outage", "duplicate charge", "overcharged"
-    ]
-    
-    # Medium urgency indicators
-    medium_urgency_keywords = [
-        "soon", "today", "this week", "important", "blocking", "stuck",
-        "can't proceed", "issue", "problem", "bug", "glitch"
-    ]
-    
-    # Category-specific urgency rules
-    if category == "billing":
-        # Billing issues are often high priority due to financial impact
-        if any(word in text_lower for word in ["duplicate", "overcharge", "wrong amount", "double"]):
-            return "high"
-        elif any(word in text_lower for word in ["refund", "credit", "dispute"]):
-            return "medium"
-        else:
-            return "medium"
-    
-    elif category == "bug":
-        # Bug severity based on impact keywords
-        if any(word in text_lower for word in ["crash", "broken", "not working", "can't access"]):
-            return "high"
-        elif any(word in text_lower for word in ["slow", "glitch", "minor"]):
-            return "low"
-        else:
-            return "medium"
-    
-    # Check for explicit urgency keywords
-    if any(word in text_lower for word in high_urgency_keywords):
-        return "high"
-    elif any(word in text_lower for word in medium_urgency_keywords):
-        return "medium"
-    
-    return "low"
+# Explicit urgency keywords, used for categories without their own rules
+GENERAL_URGENCY_RULES = ([(HIGH_URGENCY_MASK, "high"), (MEDIUM_URGENCY_MASK, "medium")], "low")
+
+# Per-category (rules, default): the first rule whose mask hits decides the urgency
+URGENCY_RULES = {
+    # Billing issues are often high priority due to financial impact
+    "billing": ([(BILLING_HIGH_URGENCY_MASK, "high"), (BILLING_MEDIUM_URGENCY_MASK, "medium")], "medium"),
+    # Bug severity based on impact keywords
+    "bug": ([(BUG_HIGH_URGENCY_MASK, "high"), (BUG_LOW_URGENCY_MASK, "low")], "medium"),
+    "feature": GENERAL_URGENCY_RULES,
+    "other": GENERAL_URGENCY_RULES
+}
 
-def generate_rationale(category: str, urgency: str, text: str) -> str:
+def _determine_urgency(mask: int, category: str) -> str:
+    """Determine urgency level from the category and keyword hit mask"""
+    rules, default = URGENCY_RULES[category]
+    for rule_mask, urgency in rules:
+        if mask & rule_mask:
+            return urgency
+    return default
+
+def _build_rationale(category: str, urgency: str, keywords_detected: bool) -> str:
     """Generate human-readable rationale for the classification"""
-    text_lower = text.lower()
-    
     rationale_parts = []
     
     # Category rationale
     if category == "billing":
-        if "duplicate" in text_lower or "overcharge" in text_lower:
+        if keywords_detected:
             rationale_parts.append("Payment/billing keywords detected")
         else:
             rationale_parts.append("Billing/payment related issue")
     elif category == "bug":
-        if "crash" in text_lower or "broken" in text_lower:
+        if keywords_detected:
             rationale_parts.append("System failure/crash keywords detected")
         else:
             rationale_parts.append("Technical issue/bug reported")
@@ -148,16 +214,63 @@ def generate_rationale(category: str, urgency: str, text: str) -> str:
     
     return "; ".join(rationale_parts) + "."
 
+# Every possible rationale, built once; keyword detection only varies billing and bug
+RATIONALE_TABLE = {
+    (category, urgency, keywords_detected): _build_rationale(category, urgency, keywords_detected)
+    for category in ("billing", "bug", "feature", "other")
+    for urgency in ("low", "medium", "high")
+    for keywords_detected in (False, True)
+}
+
+# Keywords that pick the "detected" rationale wording, per category
+RATIONALE_MASKS = {
+    "billing": BILLING_RATIONALE_MASK,
+    "bug": BUG_RATIONALE_MASK,
+    "feature": 0,
+    "other": 0
+}
+
+def _generate_rationale(category: str, urgency: str, mask: int) -> str:
+    """Look up the rationale for the classification"""
+    return RATIONALE_TABLE[category, urgency, bool(mask & RATIONALE_MASKS[category])]
+
+# Bulk uploads produce few distinct masks, so decoded classifications are shared
+@functools.lru_cache(maxsize=1024)
+def _classify(mask: int) -> Tuple[str, str, str]:
+    """Derive (category, urgency, rationale) from a keyword hit mask"""
+    category = _categorize(mask)
+    urgency = _determine_urgency(mask, category)
+    return category, urgency, _generate_rationale(category, urgency, mask)
+
+# Texts longer than this bypass the result cache to bound its memory
+TRIAGE_CACHE_MAX_TEXT_LENGTH = 1024
+
+def _triage_text(text: str) -> Tuple[str, str, str]:
+    """Lowercase the text once and classify it from its keyword hit mask"""
+    # The mask is all that category, urgency and rationale need from the text
+    return _classify(scan_keywords(text.lower()))
+
+# Memoized triage for repeated (canned or forwarded) ticket texts
+_triage_cached = functools.lru_cache(maxsize=8192)(_triage_text)
+
+def triage(text: str) -> Tuple[str, str, str]:
+    """Classify a ticket, returning (category, urgency, rationale) from one keyword scan"""
+    if len(text) > TRIAGE_CACHE_MAX_TEXT_LENGTH:
+        return _triage_text(text)
+    return _triage_cached(text)
+
+def triage_batch(texts: List[str]) -> List[Tuple[str, str, str]]:
+    """Classify many tickets, reusing cached results for repeated texts and masks"""
+    return [triage(text) for text in texts]
+
 @app.post("/api/triage", response_model=TriageResponse)
 async def triage_ticket(request: TriageRequest):
     """Triage a support ticket and return structured classification"""
     if not request.text.strip():
         raise HTTPException(status_code=400, detail="Ticket text cannot be empty")
     
-    # Determine category and urgency
-    category = categorize_ticket(request.text)
-    urgency = determine_urgency(request.text, category)
-    rationale = generate_rationale(category, urgency, request.text)
+    # Determine category, urgency and rationale
+    category, urgency, rationale = triage(request.text)
     
     return TriageResponse(
         category=category,
@@ -166,29 +279,54 @@ async def triage_ticket(request: TriageRequest):
         text=request.text
     )
 
-def process_csv_tickets(csv_content: str) -> List[str]:
-    """Parse CSV content and extract ticket texts from cells"""
-    tickets = []
+def iter_csv_tickets(csv_file: BinaryIO) -> Iterator[str]:
+    """Stream ticket texts from the cells of an uploaded CSV file"""
+    # Decode incrementally instead of reading the whole upload into memory; iterdecode
+    # works on any binary file, unlike TextIOWrapper which needs readable() (3.11+
+    # for SpooledTemporaryFile)
+    csv_text = codecs.iterdecode(csv_file, "utf-8", errors="strict")
     
     try:
-        # Create a StringIO object to read the CSV content
-        csv_file = io.StringIO(csv_content)
-        csv_reader = csv.reader(csv_file)
-        
-        for row in csv_reader:
+        for row in csv.reader(csv_text):
             for cell in row:
                 # Clean the cell content and add if it's not empty
                 cell_text = cell.strip()
                 if cell_text and len(cell_text) > 3:  # Minimum length to be meaningful
-                    tickets.append(cell_text)
+                    yield cell_text
     
-    except Exception as e:
+    except csv.Error as e:
         raise HTTPException(status_code=400, detail=f"Invalid CSV format: {str(e)}")
+
+def triage_csv(csv_file: BinaryIO, include_text: bool = False) -> bytes:
+    """Parse and triage an uploaded CSV, returning the encoded bulk response body"""
+    # Extract ticket texts from CSV
+    ticket_texts = list(iter_csv_tickets(csv_file))
     
-    return tickets
+    if not ticket_texts:
+        raise HTTPException(status_code=400, detail="No valid ticket texts found in CSV")
+    
+    # Process each ticket
+    triaged_tickets = []
+    for index, (category, urgency, rationale) in enumerate(triage_batch(ticket_texts)):
+        ticket = {
+            "index": index,
+            "category": category,
+            "urgency": urgency,
+            "rationale": rationale
+        }
+        # Clients usually already hold the CSV, so echoing texts back is opt-in
+        if include_text:
+            ticket["text"] = ticket_texts[index]
+        triaged_tickets.append(ticket)
+    
+    return orjson.dumps({
+        "tickets": triaged_tickets,
+        "total_processed": len(triaged_tickets)
+    })
 
-@app.post("/api/triage/bulk", response_model=BulkTriageResponse)
-async def triage_bulk_tickets(file: UploadFile = File(...)):
+# Bulk results skip response_model validation; the schema is kept for the docs only
+@app.post("/api/triage/bulk", responses={200: {"model": BulkTriageResponse}})
+async def triage_bulk_tickets(file: UploadFile = File(...), include_text: bool = False):
     """Triage multiple support tickets from a CSV file"""
     
     # Validate file type
@@ -196,40 +334,27 @@ async def triage_bulk_tickets(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="File must be a CSV file")
     
     try:
-        # Read CSV content
-        csv_content = await file.read()
-        csv_text = csv_content.decode('utf-8')
-        
-        # Extract ticket texts from CSV
-        ticket_texts = process_csv_tickets(csv_text)
+        # Run the CPU-bound work off the event loop so other requests stay responsive
+        loop = asyncio.get_running_loop()
+        content = await loop.run_in_executor(EXECUTOR, triage_csv, file.file, include_text)
         
-        if not ticket_texts:
-            raise HTTPException(status_code=400, detail="No valid ticket texts found in CSV")
-        
-        # Process each ticket
-        triaged_tickets = []
-        for text in ticket_texts:
-            category = categorize_ticket(text)
-            urgency = determine_urgency(text, category)
-            rationale = generate_rationale(category, urgency, text)
-            
-            triaged_tickets.append(TriageResponse(
-                category=category,
-                urgency=urgency,
-                rationale=rationale,
-                text=text
-            ))
-        
-        return BulkTriageResponse(
-            tickets=triaged_tickets,
-            total_processed=len(triaged_tickets)
-        )
+        return Response(content=content, media_type="application/json")
         
+    except HTTPException:
+        raise
     except UnicodeDecodeError:
         raise HTTPException(status_code=400, detail="CSV file must be UTF-8 encoded")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing CSV: {str(e)}")
 
+@app.get("/debug/cache_info")
+async def read_cache_info():
+    """Report triage cache statistics for tuning"""
+    return {
+        "text_cache": _triage_cached.cache_info()._asdict(),
+        "mask_cache": _classify.cache_info()._asdict()
+    }
+
 @app.get("/")
 async def read_index():
     """Serve the main HTML page"""